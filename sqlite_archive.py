@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 import argparse
 import atexit
-import json
+import functools
+import itertools
+import mmap
+import os
 import pathlib
 import sqlite3
+import stat
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Any, Dict, Generator, List, Optional, Union
 
-from sqlite3_archive.fileinfo import FileInfo
+from sqlite3_archive.fileinfo import FileInfo, hash_file, new_hasher
 from sqlite3_archive.utility import (DBUtility, calc_name, clean_table_name,
-                                     glob_list, infer_table,
+                                     glob_list, infer_table, loads_json,
                                      process_duplicates)
 
 
@@ -18,11 +25,11 @@ class Args:
     db: str = field(default_factory=str)
     mode: str = field(default_factory=str)
     table: Union[str, None] = field(default_factory=str)
-    autovacuum: int = field(default_factory=int)
+    autovacuum: int = 1
     wal: bool = field(default_factory=bool)
     rollback: bool = field(default_factory=bool)
     files: Union[List[str], Generator] = field(default_factory=list)
-    dups_file: Union[str, pathlib.Path] = field(default_factory=str)
+    dups_file: Optional[Union[str, pathlib.Path]] = None
     exclude: Union[List[str], Generator] = field(default_factory=list)
     nodups: bool = field(default_factory=bool)
     hidedups: bool = field(default_factory=bool)
@@ -43,68 +50,55 @@ class Args:
         self.table = clean_table_name(self.table)  # type: ignore
         self.files = glob_list(self.files)
         self.exclude = glob_list(self.exclude)
-        self.dups_file = pathlib.Path(self.dups_file).resolve()
+        if self.dups_file:
+            self.dups_file = pathlib.Path(self.dups_file).resolve()
 
 
 args = Args()
 
+# Number of files whose hashes are probed against the database in one query.
+BATCH_SIZE: int = 500
 
-def parse_args() -> Args:
+# Flush pending inserts to the database once this much file data is buffered.
+MAX_PENDING_BYTES: int = 64 * 1024 * 1024
 
-    files_args: tuple = ("files", "*")
-    lowercase_table_args: dict = {
-        "long": "--lowercase-table",
-        "action": "store_true",
-        "dest": "lower",
-        "help": "Modify the inferred table name to be lowercase (has no effect if table name is specified)."
-    }
-    table_arguments: dict = {
-        "long": "--table",
-        "short": "-t",
-        "dest": "table",
-        "help": "Name of table to use."
-    }
+# Blobs above this size are streamed in chunks instead of materialized whole.
+STREAM_THRESHOLD: int = 32 * 1024 * 1024
 
-    parser: argparse.ArgumentParser = argparse.ArgumentParser(
-        description="Imports or Exports files from an sqlite3 database.",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument("db", type=str, help="SQLite DB filename.")
-    parser.add_argument(
-        "--debug",
-        dest="debug",
-        action="store_true",
-        help="Supress any exception skipping and print some additional info.")
-    parser.add_argument(
-        "--verbose",
-        "-v",
-        action="store_true",
-        help="Print some more information without changing the exception raising policy."
-    )
-    parser.add_argument("--autovacuum-mode",
-                        "-a",
-                        nargs=1,
-                        default=1,
-                        type=int,
-                        dest="autvacuum",
-                        choices=[0, 1, 2],
-                        help="Sets the automatic vacuum mode. (0 = disabled, 1 = full autovacuum mode, 2 = incremental autovacuum mode)")
-    walargs = parser.add_mutually_exclusive_group()
-    walargs.add_argument(
-        "--wal",
-        "-w",
-        action="store_true",
-        dest="wal",
-        help="Use Write-Ahead Logging instead of rollback journal.")
-    walargs.add_argument(
-        "--rollback",
-        "-r",
-        action="store_true",
-        dest="rollback",
-        help="Switch back to rollback journal if Write-Ahead Logging is active."
-    )
+# Files up to this size are read whole during preparation and hashed in
+# memory, so the insert reuses the bytes instead of reopening the file.
+SMALL_FILE_THRESHOLD: int = 64 * 1024
+
+# Above this many requested files, extract stages the names in a temp table
+# and joins against it instead of binding one parameter per name: SQLite caps
+# a statement at 32766 parameters and giant IN lists are slow to prepare.
+EXTRACT_TEMP_TABLE_THRESHOLD: int = 500
+
+# Incremental BLOB I/O arrived in Python 3.11.
+_HAS_BLOBOPEN: bool = hasattr(sqlite3.Connection, "blobopen")
+
+# Snapshots of args.debug/args.verbose taken after parsing: per-file code
+# tests one module global instead of two attribute lookups per check.
+DEBUG: bool = False
+VERBOSE: bool = False
+
+
+files_args: tuple = ("files", "*")
+lowercase_table_args: dict = {
+    "long": "--lowercase-table",
+    "action": "store_true",
+    "dest": "lower",
+    "help": "Modify the inferred table name to be lowercase (has no effect if table name is specified)."
+}
+table_arguments: dict = {
+    "long": "--table",
+    "short": "-t",
+    "dest": "table",
+    "help": "Name of table to use."
+}
 
-    subparsers: argparse._SubParsersAction = parser.add_subparsers(dest="mode")
 
+def _build_drop_parser(subparsers: argparse._SubParsersAction) -> None:
     drop: argparse.ArgumentParser = subparsers.add_parser(
         'drop',
         aliases=['drop-table', 'drop_table'],
@@ -116,6 +110,8 @@ def parse_args() -> Args:
                       help="Do not execute VACUUM when dropping a table")
     drop.add_argument("table", help="Name of table to use")
 
+
+def _build_add_parser(subparsers: argparse._SubParsersAction) -> None:
     add = subparsers.add_parser(
         "add",
         help="Add files to the database.",
@@ -140,8 +136,8 @@ def parse_args() -> Args:
         "--dups-file",
         type=str,
         dest="dups_file",
-        help="Location of the file to store the list of duplicate files to.",
-        default=f"{pathlib.Path.cwd().joinpath('duplicates.json')}")
+        help="Location of the file to store the list of duplicate files to. (default: duplicates.json in the current directory)",
+        default=None)
     add.add_argument(
         "--no-dups",
         action="store_true",
@@ -182,11 +178,15 @@ def parse_args() -> Args:
                      type=str,
                      help="Files to be archived in the SQLite Database.")
 
-    compact = subparsers.add_parser(
+
+def _build_compact_parser(subparsers: argparse._SubParsersAction) -> None:
+    subparsers.add_parser(
         "compact",
         help="Run the VACUUM query on the database (WARNING: depending on the size of the DB, it might take a while)",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 
+
+def _build_create_parser(subparsers: argparse._SubParsersAction) -> None:
     create = subparsers.add_parser(
         "create",
         aliases=['create-table', 'create_table'],
@@ -194,6 +194,8 @@ def parse_args() -> Args:
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     create.add_argument("table", help=table_arguments["help"])
 
+
+def _build_extract_parser(subparsers: argparse._SubParsersAction) -> None:
     extract: argparse.ArgumentParser = subparsers.add_parser(
         'extract',
         help="Extract files from a table instead of adding them.",
@@ -234,19 +236,102 @@ def parse_args() -> Args:
         help="Files to be extracted from the SQLite Database. Leaving this empty will extract all files from the specified table."
     )
 
-    return parser.parse_args(namespace=args)
+
+# Maps every accepted subcommand token (including aliases) to its builder.
+_SUBCOMMAND_BUILDERS: Dict[str, Any] = {
+    "drop": _build_drop_parser,
+    "drop-table": _build_drop_parser,
+    "drop_table": _build_drop_parser,
+    "add": _build_add_parser,
+    "compact": _build_compact_parser,
+    "create": _build_create_parser,
+    "create-table": _build_create_parser,
+    "create_table": _build_create_parser,
+    "extract": _build_extract_parser,
+}
+
+
+@functools.cache
+def _build_parser(modes: Optional[tuple] = None) -> argparse.ArgumentParser:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Imports or Exports files from an sqlite3 database.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("db", type=str, help="SQLite DB filename.")
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_true",
+        help="Supress any exception skipping and print some additional info.")
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Print some more information without changing the exception raising policy."
+    )
+    parser.add_argument("--autovacuum-mode",
+                        "-a",
+                        default=1,
+                        type=int,
+                        dest="autovacuum",
+                        choices=[0, 1, 2],
+                        help="Sets the automatic vacuum mode. (0 = disabled, 1 = full autovacuum mode, 2 = incremental autovacuum mode)")
+    walargs = parser.add_mutually_exclusive_group()
+    walargs.add_argument(
+        "--wal",
+        "-w",
+        action="store_true",
+        dest="wal",
+        help="Use Write-Ahead Logging instead of rollback journal.")
+    walargs.add_argument(
+        "--rollback",
+        "-r",
+        action="store_true",
+        dest="rollback",
+        help="Switch back to rollback journal if Write-Ahead Logging is active."
+    )
+
+    subparsers: argparse._SubParsersAction = parser.add_subparsers(dest="mode")
+
+    # Construct only the subparser(s) the command line mentions; building
+    # all five costs the bulk of argparse start-up time. With no recognized
+    # token (e.g. bare --help) every subcommand is registered.
+    built: List[Any] = []
+    for token, builder in _SUBCOMMAND_BUILDERS.items():
+        if (modes is None or token in modes) and builder not in built:
+            built.append(builder)
+            builder(subparsers)
+
+    return parser
+
+
+def parse_args() -> Args:
+    modes = tuple(a for a in sys.argv[1:] if a in _SUBCOMMAND_BUILDERS)
+    parsed = _build_parser(modes or None).parse_args(namespace=args)
+    global DEBUG, VERBOSE
+    DEBUG = bool(args.debug)
+    VERBOSE = bool(args.verbose)
+    return parsed
 
 
 def calc_extract_query(args) -> str:
     files_len = len(args.files)
 
+    # With incremental BLOB I/O available the data column is read through
+    # blobopen() per row, so the query only carries its length.
+    columns = "rowid, filename, hash, length(data) AS datalen" if _HAS_BLOBOPEN else "rowid, filename, data, hash"
+
     if args.files and files_len > 0:
-        question_marks = '?' * files_len
+        if files_len > EXTRACT_TEMP_TABLE_THRESHOLD:
+            # The names were staged in temp.extract_names by extract(); the
+            # subquery has no parameter-count ceiling.
+            return (f"SELECT {columns} FROM {args.table} "
+                    "WHERE filename IN (SELECT f FROM temp.extract_names) ORDER BY filename ASC")
         if files_len > 1:
-            return f"SELECT rowid, data FROM {args.table} WHERE filename IN ({','.join(question_marks)}) ORDER BY filename ASC"
+            placeholders = ",".join(["?"] * files_len)
+            return f"SELECT {columns} FROM {args.table} WHERE filename IN ({placeholders}) ORDER BY filename ASC"
         else:
-            return f"SELECT rowid, data FROM {args.table} WHERE filename == ? ORDER BY filename ASC"
-    return f"SELECT rowid, data FROM {args.table} ORDER BY filename ASC"
+            return f"SELECT {columns} FROM {args.table} WHERE filename == ? ORDER BY filename ASC"
+    return f"SELECT {columns} FROM {args.table} ORDER BY filename ASC"
 
 
 class SQLiteArchive(DBUtility):
@@ -262,8 +347,9 @@ class SQLiteArchive(DBUtility):
         if self.args.table:
             self.args.table = clean_table_name(self.args.table, lower=self.args.lower)
 
-        # Remove duplicate file paths
-        self.args.files = list(set(self.args.files))
+        # Remove duplicate file paths; dict.fromkeys keeps the order they
+        # were given in, so runs stay deterministic.
+        self.args.files = list(dict.fromkeys(self.args.files))
 
         # Initialize the superclass with parsed arguments
         super().__init__(self.args)
@@ -271,16 +357,51 @@ class SQLiteArchive(DBUtility):
         # Set journal and av settings
         self.set_journal_and_av(self.args)
 
+        # Bulk ingest is commit-bound under the rollback journal, so add mode
+        # defaults to WAL with synchronous=NORMAL: fsyncs happen at checkpoint
+        # time instead of per transaction. --rollback still opts out.
+        if self.args.mode == "add" and not self.args.rollback:
+            self.exec_query_no_commit("PRAGMA journal_mode=wal;")
+            self.exec_query_no_commit("PRAGMA synchronous=NORMAL;")
+
         # Set row factory for the database connection
         self.dbcon.row_factory = sqlite3.Row
 
-        # Register functions to be executed when the program exits
-        atexit.register(self.dbcon.close)
-        atexit.register(self.dbcon.execute, "PRAGMA optimize;")
+        # One exit handler makes the optimize-then-close ordering explicit
+        # instead of leaning on atexit's LIFO behavior across two handlers.
+        atexit.register(self._close_at_exit)
 
         # Assign file paths
         self.files = self.args.files
 
+        # Filled by process_files; filename -> stored size for skip checks.
+        self._skip_sizes: Dict[str, int] = {}
+
+        # Reverse view of the known-hashes map (filename -> digest), kept in
+        # step with it so replacements can retire the old digest's entry.
+        self._stored_digests: Dict[str, bytes] = {}
+
+        # Batch size -> multi-row INSERT text, built on demand so repeated
+        # batches of the same size reuse one prepared statement.
+        self._multirow_sql_cache: Dict[int, str] = {}
+
+        # Duplicates recorded by this run (as opposed to ones merely loaded
+        # from an existing duplicates file); gates the file rewrite.
+        self._new_dup_count: int = 0
+
+        # Output directories already created this run: most extracted files
+        # share a parent, so one mkdir covers thousands of rows.
+        self._created_dirs: set = set()
+
+    def _close_at_exit(self) -> None:
+        # PRAGMA optimize can rescan index stats; that only pays off after a
+        # session that changed data, so extract and compact skip it. The
+        # mutating modes (add, create/drop and their aliases) run it just
+        # before the connection closes.
+        if self.args.mode not in ("extract", "compact"):
+            self.dbcon.execute("PRAGMA optimize;")
+        self.dbcon.close()
+
     def drop(self):
         print(f"* Deleting table {self.args.table}...", end=' ', flush=True)
         try:
@@ -304,19 +425,49 @@ class SQLiteArchive(DBUtility):
             print("done")
 
     def schema(self):
-        self.exec_query_commit(f'''CREATE TABLE IF NOT EXISTS {self.args.table} (
+        self.dbcon.executescript(f'''CREATE TABLE IF NOT EXISTS {self.args.table} (
             "filename" TEXT NOT NULL UNIQUE,
             "data" BLOB NOT NULL,
-            "hash" TEXT NOT NULL UNIQUE,
+            "hash" BLOB NOT NULL UNIQUE,
+            "size" INTEGER,
             PRIMARY KEY("hash")
-        );
-        CREATE UNIQUE INDEX IF NOT EXISTS "{self.args.table}_filename_hash_index" ON "{self.args.table}" ("filename" ASC, "hash");
-        CREATE UNIQUE INDEX IF NOT EXISTS "{self.args.table}_filename_index" ON "{self.args.table}" ("filename" ASC);
-        CREATE UNIQUE INDEX IF NOT EXISTS "{self.args.table}_hash_index" ON "{self.args.table}" ("hash");
-        CREATE UNIQUE INDEX IF NOT EXISTS "{self.args.table}_hash_filename_index" ON "{self.args.table}" ("hash", "filename" ASC);''')
-
-    def filter_files_insert(self, files: List[str], exclude: List[str]) -> List[str]:
-        return [file for file in files if pathlib.Path(file).name not in exclude]
+        );''')
+        # Tables from before the size column: add it in place. Legacy rows
+        # keep NULL there, which simply disqualifies them from size-based
+        # shortcuts until rewritten.
+        try:
+            self.dbcon.execute(f'ALTER TABLE {self.args.table} ADD COLUMN "size" INTEGER')
+        except sqlite3.OperationalError:
+            pass
+        self.drop_aux_indexes()
+
+        # Build the parameterized statements once so every row binds against
+        # the exact same SQL text and hits sqlite3's statement cache.
+        self._insert_sql = f"insert into {self.args.table} (filename, data, hash, size) values (?, ?, ?, ?)"
+        self._replace_sql = f"replace into {self.args.table} (filename, data, hash, size) values (?, ?, ?, ?)"
+        self._insert_zeroblob_sql = f"insert into {self.args.table} (filename, data, hash, size) values (?, zeroblob(?), ?, ?)"
+        self._update_zeroblob_sql = (f"update {self.args.table} set data=zeroblob(?), hash=?, size=? "
+                                     "where filename=?")
+        self._rowid_sql = f"select rowid from {self.args.table} where filename = ?"
+        # UPSERT updates the conflicting row in place; REPLACE INTO deletes
+        # and reinserts, churning every index. Kept as fallback for conflicts
+        # on other constraints (e.g. the new data matches another row's hash).
+        self._upsert_sql = (f"insert into {self.args.table} (filename, data, hash, size) values (?, ?, ?, ?) "
+                            "on conflict(filename) do update set data=excluded.data, hash=excluded.hash, size=excluded.size")
+
+    # Indexes the schema used to create alongside the table. Every one of
+    # them duplicates the automatic indexes behind hash PRIMARY KEY and
+    # filename UNIQUE, so each insert paid four extra B-tree updates for no
+    # query the constraints don't already serve.
+    _AUX_INDEX_SUFFIXES = ('_filename_hash_index', '_filename_index',
+                           '_hash_index', '_hash_filename_index')
+
+    def drop_aux_indexes(self):
+        for suffix in self._AUX_INDEX_SUFFIXES:
+            self.dbcon.execute(f'DROP INDEX IF EXISTS "{self.args.table}{suffix}"')
+
+    def filter_files_insert(self, files: List[str], exclude: frozenset) -> List[str]:
+        return [file for file in files if os.path.basename(file) not in exclude]
 
     def print_file_info(self, files: List[str], exclude: List[str]) -> None:
         print("File List:")
@@ -326,14 +477,22 @@ class SQLiteArchive(DBUtility):
 
     def prepare_files_and_exclusions(self) -> None:
         if self.args.files:
-            self.files = [x for x in glob_list(self.args.files) if pathlib.Path(x).resolve() != pathlib.Path(self.args.db).resolve()]
+            # realpath() costs several syscalls per candidate, so resolve the
+            # database path once and compare plain strings per file.
+            db_real = os.path.realpath(self.args.db)
+            # Keep plain strings through the sort: list.sort on str is a
+            # C-level comparison, while Path.__lt__ compares part tuples in
+            # Python. Paths are constructed per file later, where needed.
+            self.files = [os.fspath(x) for x in glob_list(self.args.files) if os.path.realpath(x) != db_real]
             self.files.sort()
 
             if not self.args.exclude:
                 self.args.exclude = ["Thumbs.db"]
-            self.args.exclude = list(set(self.args.exclude))
-            self.args.exclude = [pathlib.Path(i).name for i in self.args.exclude]
-            files = self.filter_files_insert([str(items) for items in self.files], self.args.exclude)
+            # Frozenset membership makes the filter O(1) per file regardless
+            # of how many --exclude flags were given.
+            exclude = frozenset(os.path.basename(i) for i in self.args.exclude)
+            self.args.exclude = sorted(exclude)
+            files = self.filter_files_insert(self.files, exclude)
 
             if self.args.verbose or self.args.debug:
                 self.print_file_info(files, self.args.exclude)
@@ -341,135 +500,317 @@ class SQLiteArchive(DBUtility):
             if not files:
                 raise RuntimeError("No files were found.")
 
-    def insert(self, fileinfo) -> None:
-        query = f"insert into {self.args.table} (filename, data, hash) values (?, ?, ?)"
-        values = (fileinfo.name, fileinfo.data, fileinfo.digest)
-        if self.args.no_atomic:
-            print(f"* Adding {fileinfo.name} to {self.args.table}...",
-                  end=' ',
-                  flush=True)
-            self.exec_query_commit(query, values)
-        else:
-            print(
-                f"* Queueing {fileinfo.name} for addition to {self.args.table}...",
-                end=' ',
-                flush=True)
-            self.exec_query_no_commit(query, values)
-
-    def filter_files_replace(self, file_paths: List[str]) -> List[str]:
-        return [x for x in file_paths if pathlib.Path(x).resolve() != pathlib.Path(self.args.db).resolve()]
-
-    def sorted_files(self, file_paths: List[str]) -> List[str]:
-        sorted_files = self.filter_files_replace(file_paths)
-        sorted_files.sort()
-        return sorted_files
-
-    def replace_fileinfo(self, fileinfo: FileInfo, query: str, values: tuple) -> None:
-        if self.args.no_atomic:
-            print(
-                f"* Replacing {fileinfo.name}'s data in {self.args.table} with specified file's data...",
-                end=' ',
-                flush=True)
-            self.exec_query_commit(query, values)
+            self.files = files
+
+    def _multirow_insert_sql(self, nrows: int) -> str:
+        """Return (and cache) a multi-row INSERT for ``nrows`` rows.
+
+        A single ``VALUES (?,?,?,?),(?,?,?,?),...`` statement runs one VDBE
+        program for the whole batch instead of a reset/step per row as
+        executemany does. BATCH_SIZE rows bind at most 2000 parameters, well
+        under SQLite's 32766 cap.
+        """
+        sql = self._multirow_sql_cache.get(nrows)
+        if sql is None:
+            placeholders = ",".join(("(?, ?, ?, ?)",) * nrows)
+            sql = (f"insert into {self.args.table} "
+                   f"(filename, data, hash, size) values {placeholders}")
+            self._multirow_sql_cache[nrows] = sql
+        return sql
+
+    def insert_batch(self, rows: List[tuple], known: Dict[bytes, str]) -> None:
+        if not rows:
+            return
+        print(f"* Adding {len(rows)} file(s) to {self.args.table}...",
+              end=' ',
+              flush=True)
+        try:
+            if self.args.no_atomic:
+                self.exec_many_commit(self._insert_sql, rows)
+            else:
+                # One explicit transaction per flushed batch: a single fsync
+                # covers every row, and the batch goes in as one multi-row
+                # VALUES statement rather than an executemany loop.
+                with self.dbcon:
+                    self.dbcon.execute(self._multirow_insert_sql(len(rows)),
+                                       tuple(itertools.chain.from_iterable(rows)))
+        except (sqlite3.IntegrityError, sqlite3.InterfaceError):
+            print("failed, retrying files individually...")
+            self.insert_rows_individually(rows, known)
         else:
-            print(
-                f"* Queueing {fileinfo.name}'s data for replacement in {self.args.table} with specified file's data...",
-                end=' ',
-                flush=True)
-            self.exec_query_no_commit(query, values)
-
-    def replace(self, fileinfo: FileInfo) -> None:
-        self.files = self.sorted_files(list(self.args.files))
-        query = f"replace into {self.args.table} (filename, data, hash) values (?, ?, ?)"
-        values = (fileinfo.name, fileinfo.data, fileinfo.digest)
-        self.replace_fileinfo(fileinfo, query, values)
-
-    def ensure_path_type(self, file):
-        if not isinstance(file, pathlib.Path):
-            return pathlib.Path(file)
-        return file
-
-    def process_file(self, file, replaced):
-        i = self.ensure_path_type(file)
-        fullpath = i.resolve()
-        fileinfo = FileInfo(name=calc_name(fullpath, verbose=self.args.verbose))  # Assuming you have a FileInfo class.
-
-        if i.is_file():
-            exists = 0
-            if self.args.replace:
-                exists = self.check_existing_file(fileinfo)
-
-            fileinfo.data = bytes(i.read_bytes())
-            fileinfo.digest = fileinfo.calculate_hash()
+            print("done")
 
-            if self.args.replace and exists > 0:
-                self.replace(fileinfo)
-                replaced += 1
+    def insert_rows_individually(self, rows: List[tuple], known: Dict[bytes, str]) -> None:
+        for row in rows:
+            print(f"* Adding {row[0]} to {self.args.table}...", end=' ', flush=True)
+            try:
+                if self.args.no_atomic:
+                    self.exec_query_commit(self._insert_sql, row)
+                else:
+                    self.exec_query_no_commit(self._insert_sql, row)
+            except sqlite3.IntegrityError:
+                print("failed (filename already exists)")
+                known.pop(row[2], None)
+                self._stored_digests.pop(row[0], None)
+                if self.args.debug:
+                    raise
+            except sqlite3.InterfaceError:
+                self.handle_interface_error(len(row[1]))
+                known.pop(row[2], None)
+                self._stored_digests.pop(row[0], None)
+                if self.args.debug:
+                    raise
             else:
-                self.insert(fileinfo)
-        return replaced
+                print("done")
 
-    def check_existing_file(self, fileinfo):
-        exists = int(
-            self.exec_query_no_commit(
-                f"select count(distinct filename) from {self.args.table} where filename = ?",
-                values=(fileinfo.name,),
-                return_data=True,
-                one=True)[0])  # type: ignore
-        if self.args.debug or self.args.verbose:
-            print(exists)
-        return exists
+    def insert_streaming(self, name: str, digest: bytes, path: pathlib.Path, size: int) -> bool:
+        """Insert one large file by streaming into a preallocated blob.
 
-    def handle_integrity_error(self, fileinfo, fullpath, dbname, dups):
-        query = self.exec_query_no_commit(f"select filename from {self.args.table} where hash == ?", (fileinfo.digest,), return_data=True)[0][0]  # type: ignore
-        querytype: str = type(query)
-        querylen: int = len(query)
-        if self.args.debug or self.args.verbose:
-            print(querytype)
-            print(querylen)
-            if querytype == sqlite3.Row:
-                print(tuple(query))
+        Allocating the row with zeroblob() and writing through blobopen keeps
+        peak memory at the chunk size instead of the whole file, and avoids
+        the 1 GB parameter-size ceiling of bound bytes values.
+        """
+        print(f"* Adding {name} to {self.args.table}...", end=' ', flush=True)
+        try:
+            with self.dbcon:
+                cursor = self.dbcon.execute(self._insert_zeroblob_sql,
+                                            (name, size, digest, size))
+                with self.dbcon.blobopen(self.args.table, "data", cursor.lastrowid) as blob, \
+                        open(path, 'rb', buffering=0) as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # The mapping satisfies the buffer protocol, so the blob
+                    # write copies straight from the page cache; the file
+                    # contents never land on the Python heap.
+                    blob.write(mm)
+        except sqlite3.IntegrityError:
+            print("failed (filename already exists)")
+            if self.args.debug:
+                raise
+            return False
+        else:
+            print("done")
+            return True
+
+    def replace_row(self, values: tuple) -> bool:
+        name = values[0]
+        try:
+            if self.args.no_atomic:
+                if DEBUG or VERBOSE:
+                    print(
+                        f"* Replacing {name}'s data in {self.args.table} with specified file's data...",
+                        end=' ',
+                        flush=True)
+                try:
+                    self.exec_query_commit(self._upsert_sql, values)
+                except sqlite3.IntegrityError:
+                    self.exec_query_commit(self._replace_sql, values)
             else:
-                print(query)
-            if query and querylen >= 1:
-                print("duplicate")
+                if DEBUG or VERBOSE:
+                    print(
+                        f"* Queueing {name}'s data for replacement in {self.args.table} with specified file's data...",
+                        end=' ',
+                        flush=True)
                 try:
-                    dups[dbname][str(query)].append(str(fullpath))
-                except KeyError:
-                    dups[dbname][str(query)] = [str(fullpath)]
-                if self.args.debug or self.args.verbose:
-                    print(query)
+                    self.exec_query_no_commit(self._upsert_sql, values)
+                except sqlite3.IntegrityError:
+                    self.exec_query_no_commit(self._replace_sql, values)
+        except sqlite3.InterfaceError:
+            # Payload past SQLite's bound-parameter ceiling; report and keep
+            # going, same as the insert path.
+            self.handle_interface_error(len(values[1]))
+            return False
+        return True
+
+    def replace_streaming(self, name: str, digest: bytes, path: pathlib.Path, size: int) -> bool:
+        """Replace one large file's row by streaming into a resized blob.
+
+        Same shape as insert_streaming: zeroblob sizing plus a blobopen
+        write from an mmap of the source keeps peak memory at the chunk size
+        and sidesteps the 1 GB bound-parameter ceiling a whole-payload
+        upsert would hit.
+        """
+        print(f"* Replacing {name}'s data in {self.args.table}...", end=' ', flush=True)
+        try:
+            with self.dbcon:
+                self.dbcon.execute(self._update_zeroblob_sql, (size, digest, size, name))
+                rowid = self.dbcon.execute(self._rowid_sql, (name,)).fetchone()[0]
+                with self.dbcon.blobopen(self.args.table, "data", rowid) as blob, \
+                        open(path, 'rb', buffering=0) as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    blob.write(mm)
+        except sqlite3.IntegrityError:
+            # The new content's hash collides with another stored row.
+            print("failed")
+            return False
+        print("done")
+        return True
 
-            dups[dbname][str(query)] = [g for g in dups[dbname][str(query)] if query not in g]
+    def ensure_path_type(self, file):
+        if not isinstance(file, pathlib.Path):
+            return pathlib.Path(file)
+        return file
 
-    def handle_interface_error(self, i):
-        if i.stat().st_size > 1000000000:
+    def load_existing_hashes(self) -> Dict[bytes, str]:
+        # One full scan of the hash index at add-start; every duplicate check
+        # afterwards is a local dict lookup instead of an index probe.
+        rows = self.exec_query_no_commit(
+            f"select hash, filename from {self.args.table}", return_data=True)
+        return {row["hash"]: row["filename"] for row in rows}  # type: ignore
+
+    def load_existing_filenames(self) -> set:
+        rows = self.exec_query_no_commit(
+            f"select filename from {self.args.table}", return_data=True)
+        return {row["filename"] for row in rows}  # type: ignore
+
+    def load_existing_sizes(self) -> Dict[str, int]:
+        rows = self.exec_query_no_commit(
+            f"select filename, size from {self.args.table}", return_data=True)
+        return {row["filename"]: row["size"] for row in rows}  # type: ignore
+
+    def record_duplicate(self, dups: Dict, dbname: str, original: str, fullpath) -> None:
+        if DEBUG or VERBOSE:
+            print(f"* {fullpath} is a duplicate of {original}")
+        # Sets make the seen-before check O(1); serialization sorts them
+        # back into lists for the JSON file.
+        entries = dups[dbname].setdefault(str(original), set())
+        fullpath_str = str(fullpath)
+        if fullpath_str not in entries:
+            entries.add(fullpath_str)
+            self._new_dup_count += 1
+
+    def handle_interface_error(self, size: int):
+        if size > 1000000000:
             print("too big, skipping.")
         else:
             print("failed")
 
-    def process_files(self, dups: Dict, dbname: str):
-        replaced = 0
-        verbose = self.args.verbose
-        for i in self.files:
-            fullpath = pathlib.Path(i).resolve()
-            fileinfo = FileInfo(name=calc_name(fullpath, verbose))
-            try:
-                replaced = self.process_file(i, replaced)
-            except sqlite3.IntegrityError:
-                self.handle_integrity_error(fileinfo, fullpath, dbname, dups)
-                if self.args.debug:
-                    raise
-                else:
+    def process_batch(self, batch: List, known: Dict[bytes, str],
+                      existing_names: set, dups: Dict, dbname: str, replaced: int) -> int:
+        to_insert: List[tuple] = []
+        pending_bytes = 0
+        for name, digest, path, fullpath, data, size in batch:
+            if self.args.replace and name in existing_names:
+                # The stored row already holds exactly this content; the
+                # upsert would rewrite the whole blob for no change.
+                if known.get(digest) == name:
+                    if DEBUG or VERBOSE:
+                        print(f"* Skipping {name} (stored data is identical)")
                     continue
-            except sqlite3.InterfaceError:
-                self.handle_interface_error(i)
-                if self.args.debug:
-                    raise
+                if data is None and _HAS_BLOBOPEN and size > STREAM_THRESHOLD:
+                    replaced_ok = self.replace_streaming(name, digest, path, size)
                 else:
+                    payload = data if data is not None else path.read_bytes()
+                    replaced_ok = self.replace_row((name, payload, digest, len(payload)))
+                    if replaced_ok and (DEBUG or VERBOSE):
+                        print("done")
+                if not replaced_ok:
                     continue
-            else:
-                print("done")
+                replaced += 1
+                # The row's old content is gone from the table; drop its
+                # digest from the duplicate map or later files carrying that
+                # content would be recorded as duplicates of data that no
+                # longer exists and never inserted.
+                old_digest = self._stored_digests.get(name)
+                if old_digest is not None and old_digest != digest:
+                    known.pop(old_digest, None)
+                known[digest] = name
+                self._stored_digests[name] = digest
+                continue
+
+            if digest in known:
+                self.record_duplicate(dups, dbname, known[digest], fullpath)
+                continue
+
+            if data is None:
+                if _HAS_BLOBOPEN and size > STREAM_THRESHOLD:
+                    # Flush queued rows first so inserts land in file order.
+                    self.insert_batch(to_insert, known)
+                    to_insert = []
+                    pending_bytes = 0
+                    if self.insert_streaming(name, digest, path, size):
+                        known[digest] = name
+                        self._stored_digests[name] = digest
+                        existing_names.add(name)
+                    continue
+                data = path.read_bytes()
+
+            to_insert.append((name, data, digest, len(data)))
+            known[digest] = name
+            self._stored_digests[name] = digest
+            existing_names.add(name)
+            pending_bytes += len(data)
+            if pending_bytes >= MAX_PENDING_BYTES:
+                self.insert_batch(to_insert, known)
+                to_insert = []
+                pending_bytes = 0
+        self.insert_batch(to_insert, known)
+        return replaced
+
+    def prepare_file(self, file) -> Optional[tuple]:
+        # The add pipeline carries plain (name, digest, path, fullpath, data,
+        # size) tuples; FileInfo (and its per-instance overhead) is only
+        # needed on the extract side where rows are verified. data is the file
+        # contents for small files (one open serves both hash and insert) and
+        # None for larger ones, which are re-read or streamed at insert time.
+        # size comes from the one stat() here so insert never stats again.
+        path = self.ensure_path_type(file)
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        fullpath = path.resolve()
+        name = calc_name(fullpath, verbose=VERBOSE)
+        # Re-runs over an unchanged tree: a filename already stored with the
+        # same size is skipped without reading or hashing a single byte.
+        # Legacy rows carry NULL sizes and never match. Replace mode still
+        # prepares every file so changed content actually lands.
+        if self._skip_sizes.get(name) == st.st_size:
+            if DEBUG or VERBOSE:
+                print(f"* Skipping {name} (already stored, same size)")
+            return None
+        if st.st_size <= SMALL_FILE_THRESHOLD:
+            data = path.read_bytes()
+            hasher = new_hasher()
+            hasher.update(data)
+            return (name, hasher.digest(), path, fullpath, data, st.st_size)
+        return (name, hash_file(path), path, fullpath, None, st.st_size)
+
+    def process_files(self, dups: Dict, dbname: str):
+        replaced = 0
+        batch: List = []
+        known: Dict[bytes, str] = self.load_existing_hashes()
+        self._stored_digests = {name: digest for digest, name in known.items()}
+        existing_names: set = self.load_existing_filenames() if self.args.replace else set()
+        self._skip_sizes = {} if self.args.replace else self.load_existing_sizes()
+        # Hashing releases the GIL, so reading+digesting fans out across
+        # cores; the database writes stay on this thread in file order.
+        # Submission is windowed to BATCH_SIZE in-flight prepares: the pool
+        # outruns the fsync-bound writer, and since small files come back
+        # with their contents, unbounded submission (Executor.map) would
+        # buffer a large slice of the tree in completed results.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            pending: deque = deque()
+
+            def drain_one() -> None:
+                nonlocal batch, replaced
+                prepared = pending.popleft().result()
+                if prepared is None:
+                    return
+                batch.append(prepared)
+                if len(batch) >= BATCH_SIZE:
+                    replaced = self.process_batch(batch, known, existing_names, dups, dbname, replaced)
+                    batch = []
+
+            for file in self.files:
+                pending.append(pool.submit(self.prepare_file, file))
+                if len(pending) >= BATCH_SIZE:
+                    drain_one()
+            while pending:
+                drain_one()
+        if batch:
+            replaced = self.process_batch(batch, known, existing_names, dups, dbname, replaced)
         return replaced
 
     def finish_and_commit(self):
@@ -484,9 +825,6 @@ class SQLiteArchive(DBUtility):
             else:
                 print("done")
 
-    def filter_non_empty_duplicates(self, dups, dbname):
-        return {h: i for h, i in dups[dbname].items() if len(dups[dbname][h]) > 0}
-
     def process_vacuum_and_compact(self, replaced):
         if self.args.replace and not self.args.no_replace_vacuum and replaced > 0 or self.args.vacuum:
             self.compact()
@@ -494,18 +832,30 @@ class SQLiteArchive(DBUtility):
     def process_all(self, dups: Dict, dbname: str, replaced: int):
         self.finish_and_commit()
 
-        dups[dbname] = self.filter_non_empty_duplicates(dups, dbname)
+        # The per-file replacement chatter is verbose-only; always report
+        # the total so quiet runs still say what happened.
+        if replaced:
+            print(f"* Replaced {replaced} file(s) in {self.args.table}")
+
+        # Back to sorted lists: deterministic JSON output, and sets aren't
+        # serializable anyway.
+        dups[dbname] = {k: sorted(v) for k, v in dups[dbname].items() if len(v) > 0}
 
         self.process_vacuum_and_compact(replaced)
 
         if not self.args.nodups:
+            # Re-serializing the whole duplicates history costs O(every dup
+            # ever seen); when this run added nothing new the file on disk
+            # already holds exactly that content, so only print.
             process_duplicates(dups,
                                dbname,
-                               outfile=str(self.args.dups_file),
+                               outfile=str(self.args.dups_file) if self._new_dup_count else "",
                                hide=self.args.hidedups,
                                currentdb=self.args.dupscurrent)
 
     def add(self):
+        self.prepare_files_and_exclusions()
+
         if not self.args.table:
             self.args.table = infer_table(mode=self.args.mode,
                                           lower=self.args.lower,
@@ -520,20 +870,31 @@ class SQLiteArchive(DBUtility):
         dbname: str = calc_name(self.db, verbose=self.args.verbose)
         dups: dict = {}
         dups[dbname] = {}
-        if self.args.dups_file:
-            dupspath: pathlib.Path = pathlib.Path(self.args.dups_file).resolve()
-            if dupspath.is_file() and not self.args.nodups:
-                dups.update(json.loads(dupspath.read_text()))
+        # Resolved here rather than as an argparse default so invocations
+        # that never touch duplicates skip the getcwd()/resolve() work.
+        if not self.args.dups_file:
+            self.args.dups_file = pathlib.Path.cwd().joinpath("duplicates.json")
+        dupspath: pathlib.Path = pathlib.Path(self.args.dups_file).resolve()
+        if dupspath.is_file() and not self.args.nodups:
+            # Both orjson and stdlib json parse bytes directly; read_bytes
+            # skips the UTF-8 decode pass read_text would pay.
+            dups.update(loads_json(dupspath.read_bytes()))
+            # This database's buckets are the ones this run appends to;
+            # sets keep those membership checks constant-time.
+            dups[dbname] = {k: set(v) for k, v in dups.get(dbname, {}).items()}
         replaced: int = 0
 
-        if dbname in list(dups.keys()):
-            dups[dbname] = {calc_name(pathlib.Path(i)): [] for i in self.files if i not in dups[dbname]}
-
         if self.args.verbose or self.args.debug:
             print("Dups Dict:")
             print(dups)
 
-        self.process_files(dups, dbname)
+        replaced = self.process_files(dups, dbname)
+
+        if len(self.files) > 1000:
+            # Fresh statistics right after a bulk load; the usual
+            # PRAGMA optimize at exit only re-analyzes when sqlite thinks
+            # stats are stale, which a freshly grown table defeats.
+            self.dbcon.execute(f'ANALYZE "{self.args.table}"')
 
         self.process_all(dups, dbname, replaced)
 
@@ -546,35 +907,76 @@ class SQLiteArchive(DBUtility):
         return outputdir.resolve()
 
     def fetch_fileinfo(self, row: Any) -> FileInfo:
-        fileinfo = FileInfo()
-        fileinfo.data = bytes(row["data"])
-        fileinfo.name = self.exec_query_no_commit(
-            f"select filename from {self.args.table} where rowid == ?",
-            values=(str(row["rowid"]), ),
-            one=True,
-            return_data=True,
-            decode=True)  # type: ignore
-        fileinfo.digest = self.exec_query_no_commit(
-            f"select hash from {self.args.table} where rowid == ?",
-            values=(str(row["rowid"]), ),
-            one=True,
-            return_data=True,
-            decode=True)  # type: ignore
-        return fileinfo
+        return FileInfo(name=row["filename"], data=row["data"], digest=row["hash"])
+
+    def _ensure_parent_dir(self, outpath: pathlib.Path) -> None:
+        parent = outpath.parent
+        if parent not in self._created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(parent)
 
     def extract_file(self, fileinfo: FileInfo, outputdir: pathlib.Path) -> None:
         outpath = outputdir.joinpath(fileinfo.name)  # type: ignore
-        parent = pathlib.Path(outpath.parent)
-        if not parent.exists():
-            parent.mkdir(parents=True)
+        self._ensure_parent_dir(outpath)
 
-        print(f"* Extracting {str(outpath)}...", end=' ', flush=True)
+        # One print per file means one flushed write() syscall per file;
+        # the batch progress line in extract() covers the quiet case.
+        if DEBUG or VERBOSE:
+            print(f"* Extracting {str(outpath)}... done", flush=True)
         outpath.write_bytes(fileinfo.data)
+
+    def stream_blob_to_file(self, row: Any, outputdir: pathlib.Path) -> None:
+        """Stream one large blob to disk, hashing it on the way out."""
+        outpath = outputdir.joinpath(row["filename"])
+        self._ensure_parent_dir(outpath)
+
+        print(f"* Extracting {str(outpath)}...", end=' ', flush=True)
+        digest = row["hash"]
+        hasher = new_hasher(len(digest) if digest else None)
+        # buffering=0 makes each 1 MiB chunk a single write() with no
+        # BufferedWriter copy in between.
+        with self.dbcon.blobopen(self.args.table, "data", row["rowid"], readonly=True) as blob, \
+                open(outpath, "wb", buffering=0) as out:
+            size = row["datalen"]
+            fd = out.fileno()
+            if hasattr(os, "posix_fallocate"):
+                # Reserve the extents up front so the filesystem does not
+                # grow (and fragment) the file one chunk at a time.
+                try:
+                    os.posix_fallocate(fd, 0, size)
+                except OSError:
+                    pass
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+            while chunk := blob.read(1048576):
+                hasher.update(chunk)
+                out.write(chunk)
+
+        if hasher.digest() != digest and not self.args.force:
+            outpath.unlink(missing_ok=True)
+            print("failed")
+            raise ValueError("The digest in the database does not match the calculated digest for the data.")
         print("done")
 
+    def write_and_verify(self, fileinfo: FileInfo, outputdir: pathlib.Path) -> None:
+        # Hash exactly once and compare; the data is already in memory, and
+        # verification happens before the write so a mismatch never leaves a
+        # partial file behind.
+        calc_hash = fileinfo.calculate_hash(len(fileinfo.digest) if fileinfo.digest else None)
+        if DEBUG or VERBOSE:
+            status = "pass" if calc_hash == fileinfo.digest else "failed"
+            print(f"* Verifying digest for {fileinfo.name}... {status}", flush=True)
+        if calc_hash != fileinfo.digest and not self.args.force:
+            if DEBUG or VERBOSE:
+                print(f"Calculated Digest: {calc_hash}")
+                print(f"Recorded Hash: {fileinfo.digest}")
+            raise ValueError("The digest in the database does not match the calculated digest for the data.")
+
+        self.extract_file(fileinfo, outputdir)
+
     def extract(self):
         if self.args.files:
-            self.args.files = list(set(self.args.files))
+            self.args.files = list(dict.fromkeys(self.args.files))
             self.args.files = [i for i in self.args.files if "*" not in i]
         if not self.args.table:
             self.args.table = infer_table(mode=str(self.args.mode),
@@ -586,7 +988,6 @@ class SQLiteArchive(DBUtility):
         if not self.args.table:
             raise RuntimeError("File or Directory specified not found and table was not specified.")
 
-        self.dbcon.text_factory = bytes
         if not type(self.args.files) in (list, tuple):
             raise TypeError("self.args.files must be a list or tuple")
 
@@ -597,46 +998,85 @@ class SQLiteArchive(DBUtility):
             self.args.out = pathlib.Path.cwd().joinpath(self.args.table.replace('_', ' '))  # type: ignore
 
         outputdir = self.create_output_dir(str(self.args.out))
+        self._created_dirs.add(outputdir)
         if self.args.debug or self.args.verbose:
             print(len(self.args.files))
             print(repr(tuple(self.args.files)))
-        query: list = calc_extract_query()  # type: ignore
+        bind_files = bool(self.args.files) and len(self.args.files) > 0
+        if bind_files and len(self.args.files) > EXTRACT_TEMP_TABLE_THRESHOLD:
+            # Too many names to bind as parameters: stage them in a temp
+            # table so the SELECT joins against it instead.
+            self.dbcon.execute("CREATE TEMP TABLE IF NOT EXISTS extract_names (f TEXT PRIMARY KEY)")
+            self.dbcon.execute("DELETE FROM temp.extract_names")
+            self.dbcon.executemany("INSERT OR IGNORE INTO temp.extract_names VALUES (?)",
+                                   ((name,) for name in self.args.files))
+            bind_files = False
+
+        query: str = calc_extract_query(self.args)
 
         cursor: sqlite3.Cursor | None = None
 
-        if self.args.files and len(self.args.files) > 0:
-            if self.args.debug or self.args.verbose:
-                print(query)
+        if self.args.debug or self.args.verbose:
+            print(query)
+
+        if bind_files:
             cursor = self.exec_query_no_commit(query, self.args.files, raw=True, return_data=True)  # type: ignore
         else:
-            if self.args.debug or self.args.verbose:
-                print(query)
             cursor = self.exec_query_no_commit(query, raw=True, return_data=True)  # type: ignore
 
-        row: Any = cursor.fetchone()  # type: ignore
-        while row:
-            try:
-                fileinfo: FileInfo = self.fetch_fileinfo(row)
-
-                if not fileinfo.verify(fileinfo.digest, self.args) and not self.args.force:  # type: ignore
-                    if self.args.debug or self.args.verbose:
-                        print(f"Calculated Digest: {fileinfo.calculate_hash()}")
-                        print(f"Recorded Hash: {fileinfo.digest}")
-                    raise ValueError("The digest in the database does not match the calculated digest for the data.")
+        # Fetch rows in batches so the per-row Python/C boundary crossing of
+        # fetchone() is paid once per batch instead of once per file.
+        cursor.arraysize = 256  # type: ignore
+
+        # The cursor stays on this thread (sqlite3 connections are not
+        # thread-safe), but the independent verify+write work fans out to a
+        # small pool so output I/O overlaps with draining the next rows.
+        futures: List[Future] = []
+        extracted = 0
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for rows in iter(cursor.fetchmany, []):  # type: ignore
+                for row in rows:
+                    extracted += 1
+                    if extracted % 1000 == 0:
+                        print(f"* Extracted {extracted} files so far...", flush=True)
+                    try:
+                        if _HAS_BLOBOPEN:
+                            if row["datalen"] > STREAM_THRESHOLD:
+                                self.stream_blob_to_file(row, outputdir)
+                                continue
+                            with self.dbcon.blobopen(self.args.table, "data", row["rowid"], readonly=True) as blob:
+                                fileinfo: FileInfo = FileInfo(name=row["filename"], data=blob.read(), digest=row["hash"])
+                        else:
+                            fileinfo = self.fetch_fileinfo(row)
+                    except sqlite3.DatabaseError:
+                        print("failed")
+
+                        if self.args.debug:
+                            raise
+                        continue
+
+                    futures.append(pool.submit(self.write_and_verify, fileinfo, outputdir))
+
+            for future in futures:
+                future.result()
+        print(f"* Extracted {extracted} file(s) to {outputdir}")
 
-                self.extract_file(fileinfo, outputdir)
+    def compact(self):
+        # With incremental auto_vacuum the freelist can be returned to the
+        # filesystem page by page; a full VACUUM rewrites the entire file
+        # and holds it locked for the duration, so only fall back to it when
+        # incremental mode isn't active.
+        if self._get_current_av_state() == 2:
+            print("* Freeing unused pages...", end=' ', flush=True)
+            try:
+                self.dbcon.execute("PRAGMA incremental_vacuum;")
             except sqlite3.DatabaseError:
                 print("failed")
+                raise
+            else:
+                print("done")
+            return
 
-                if self.args.debug:
-                    raise
-                else:
-                    row = cursor.fetchone()  # type: ignore
-                    continue
-
-            row = cursor.fetchone()  # type: ignore  # Normal end of loop
-
-    def compact(self):
         print("* Compacting the database, this might take a while...",
               end='... ',
               flush=True)
@@ -650,7 +1090,7 @@ class SQLiteArchive(DBUtility):
             print("done")
 
 
-if __name__ == "__main__":
+def main() -> None:
     sqlitearchive: SQLiteArchive = SQLiteArchive()
 
     if sqlitearchive.args.mode == 'create':
@@ -663,3 +1103,7 @@ if __name__ == "__main__":
         sqlitearchive.extract()
     elif sqlitearchive.args.mode == 'add':
         sqlitearchive.add()
+
+
+if __name__ == "__main__":
+    main()